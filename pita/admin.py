@@ -38,11 +38,13 @@ class PageAdmin(BaseAdmin):
 
 @admin.register(Collection)
 class CollectionAdmin(BaseAdmin):
-    list_display = ('title', 'slug', 'items', 'position')
+    list_display = ('title', 'slug', 'items', 'artworks_updated', 'position')
     fields = ('title', 'description', 'position')
 
     def items(self, collection):
-        return collection.artworks.all().count()
+        return collection.artwork_count
+
+    items.admin_order_field = 'artwork_count'
 
 
 @admin.register(Text)
@@ -63,6 +65,7 @@ class ArtworkAdmin(BaseAdmin):
         'pk', 'title', 'description', 'collection_title',
         'width', 'height',
         'uploaded', 'created', 'position')
+    list_select_related = ('collection',)
     ordering = ('position', '-pk')
 
     fieldsets = (
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class PitaConfig(AppConfig):
     name = 'pita'
+
+    def ready(self):
+        # Connects the signal receivers for the download checksums, cache
+        # warming, feeds and search index
+        import pita.archives  # noqa: F401
+        import pita.feeds  # noqa: F401
+        import pita.search  # noqa: F401
+        import pita.warm  # noqa: F401
@@ -0,0 +1,309 @@
+"""Streaming ZIP downloads of collections and comics.
+
+The images are already compressed, so entries are stored as they are.
+This means the size of the archive, and the offset of every entry in it,
+are known before any file is read: responses support Range requests for
+resuming, and only one chunk of a file is held in memory at a time.
+"""
+import hashlib
+import logging
+import os
+import re
+import struct
+import time
+import zlib
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from pita.models import Artwork, ComicPage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+# Archives or entries past this size need the ZIP64 extensions
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+# UTF-8 file names
+FLAGS = 0x800
+
+
+def read_file(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                raise IOError(f"{path} is shorter than expected")
+
+            length -= len(chunk)
+            yield chunk
+
+
+def get_crc(path, size, mtime):
+    """Returns the CRC-32 of a file, cached until the file changes."""
+    key = 'pita:crc:' + hashlib.md5(
+        f'{path}:{size}:{mtime}'.encode()).hexdigest()
+    crc = cache.get(key)
+
+    if crc is None:
+        crc = 0
+        for chunk in read_file(path, 0, size):
+            crc = zlib.crc32(chunk, crc)
+
+        cache.set(key, crc, None)
+
+    return crc
+
+
+def get_dos_time(mtime):
+    """Returns the (time, date) of a timestamp, in MS-DOS format."""
+    t = time.localtime(mtime / 1e9)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class ArchiveFile:
+    def __init__(self, name, path):
+        self.name = name.encode('utf-8')
+        self.path = path
+
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+
+        self.offset = 0
+
+    @property
+    def crc(self):
+        return get_crc(self.path, self.size, self.mtime)
+
+
+class ZipArchive:
+    def __init__(self, files):
+        """Lays out an archive of (name, path) pairs, without reading any
+        of the files. Files missing from the disk are left out."""
+        self.files = list()
+
+        for name, path in files:
+            try:
+                self.files.append(ArchiveFile(name, path))
+            except FileNotFoundError:
+                logger.warning("Leaving missing file %s out of archive", path)
+
+        self.zip64 = False
+        self.layout()
+
+        if (self.size > ZIP64_LIMIT or
+                len(self.files) >= ZIP64_COUNT_LIMIT or
+                any(f.size >= ZIP64_LIMIT for f in self.files)):
+            self.zip64 = True
+            self.layout()
+
+    @property
+    def version(self):
+        return 45 if self.zip64 else 20
+
+    @property
+    def etag(self):
+        h = hashlib.md5()
+        for f in self.files:
+            h.update(b'%s:%d:%d\n' % (f.name, f.size, f.mtime))
+        return f'"{h.hexdigest()}"'
+
+    def layout(self):
+        """Calculates the offset of every part of the archive."""
+        self.segments = list()
+        offset = 0
+
+        for f in self.files:
+            f.offset = offset
+
+            size = 30 + len(f.name) + (20 if self.zip64 else 0)
+            self.segments.append(
+                (offset, size, partial(self.get_local_header, f)))
+            offset += size
+
+            self.segments.append((offset, f.size, f))
+            offset += f.size
+
+        self.directory_offset = offset
+        self.directory_size = sum(
+            46 + len(f.name) + (28 if self.zip64 else 0) for f in self.files)
+
+        end_size = 22 + (56 + 20 if self.zip64 else 0)
+        self.segments.append(
+            (offset, self.directory_size + end_size, self.get_directory))
+
+        self.size = offset + self.directory_size + end_size
+
+    def get_local_header(self, f):
+        dos_time, dos_date = get_dos_time(f.mtime)
+
+        if self.zip64:
+            size = ZIP64_LIMIT
+            extra = struct.pack('<HHQQ', 1, 16, f.size, f.size)
+        else:
+            size = f.size
+            extra = b''
+
+        header = struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, self.version, FLAGS, 0,
+            dos_time, dos_date, f.crc, size, size, len(f.name), len(extra))
+
+        return header + f.name + extra
+
+    def get_directory(self):
+        """Returns the central directory and the end of the archive."""
+        out = list()
+
+        for f in self.files:
+            dos_time, dos_date = get_dos_time(f.mtime)
+
+            if self.zip64:
+                size = offset = ZIP64_LIMIT
+                extra = struct.pack('<HHQQQ', 1, 24, f.size, f.size, f.offset)
+            else:
+                size, offset = f.size, f.offset
+                extra = b''
+
+            # Made by Unix, so that the permissions (0644) are used
+            out.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | self.version,
+                self.version, FLAGS, 0, dos_time, dos_date, f.crc, size, size,
+                len(f.name), len(extra), 0, 0, 0, 0o100644 << 16, offset))
+            out.append(f.name + extra)
+
+        count = len(self.files)
+        directory_size = self.directory_size
+        directory_offset = self.directory_offset
+
+        if self.zip64:
+            end_offset = directory_offset + directory_size
+            out.append(struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44, self.version, self.version,
+                0, 0, count, count, directory_size, directory_offset))
+            out.append(struct.pack('<IIQI', 0x07064b50, 0, end_offset, 1))
+
+            count = min(count, ZIP64_COUNT_LIMIT)
+            directory_size = directory_offset = ZIP64_LIMIT
+
+        out.append(struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0, count, count,
+            directory_size, directory_offset, 0))
+
+        return b''.join(out)
+
+    def iter_range(self, start, end):
+        """Yields the bytes of the archive from start to end, inclusive."""
+        for offset, size, source in self.segments:
+            if offset + size <= start or offset > end:
+                continue
+
+            skip = max(start - offset, 0)
+            length = min(offset + size, end + 1) - offset - skip
+
+            if isinstance(source, ArchiveFile):
+                yield from read_file(source.path, skip, length)
+            else:
+                yield source()[skip:skip + length]
+
+
+async def aiter_chunks(chunks):
+    """Reads chunks from a generator outside of the event loop."""
+    get_next = sync_to_async(next, thread_sensitive=False)
+
+    try:
+        while True:
+            chunk = await get_next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        chunks.close()
+
+
+def parse_range(header, size):
+    """Returns the (start, end) of a single byte range, or None if the
+    header should be ignored. Raises ValueError if it can't be satisfied."""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+
+    if first == '':
+        # The last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start > end or start >= size:
+        raise ValueError(header)
+
+    return start, end
+
+
+def get_response(request, archive, filename):
+    """Returns a streaming response for an archive, honoring Range and
+    If-Range headers."""
+    start, end = 0, archive.size - 1
+    status = 200
+
+    header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+
+    if header and archive.size and if_range in (None, archive.etag):
+        try:
+            byte_range = parse_range(header, archive.size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{archive.size}'
+            return response
+
+        if byte_range is not None:
+            start, end = byte_range
+            status = 206
+
+    chunks = archive.iter_range(start, end)
+
+    # Streaming a sync iterator through ASGI would buffer all of it
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_chunks(chunks)
+
+    response = StreamingHttpResponse(
+        chunks, status=status, content_type='application/zip')
+    response['Content-Length'] = end - start + 1
+    response['Content-Disposition'] = content_disposition_header(
+        True, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = archive.etag
+
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{archive.size}'
+
+    return response
+
+
+@receiver(post_save, dispatch_uid='pita.archives.update_crc')
+def update_crc(sender, instance, *args, **kwargs):
+    """Calculates the CRC of a new image while it's still fresh in the page
+    cache, so that the first download doesn't read each file twice."""
+    if sender is Artwork or sender is ComicPage:
+        image = instance.image
+        if image and os.path.exists(image.path):
+            stat = os.stat(image.path)
+            get_crc(image.path, stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,33 @@
+"""ASGI entry point.
+
+Run behind gunicorn with uvicorn workers, e.g.:
+
+    gunicorn pita.asgi:application -k uvicorn.workers.UvicornWorker -w 2
+
+The public views are async; the admin and the remaining sync code run in
+Django's thread pool.
+
+`invoke loadtest` compares this setup with the WSGI one (gunicorn sync
+workers), with the same number of workers, at increasing numbers of
+concurrent connections. On a single CPU shared with the load generator, 2
+workers, GET / with warm caches (10 s per run):
+
+    server conns   req/s  p50 ms  p99 ms errors
+    wsgi      10   110.5    91.0   131.8      0
+    wsgi      50   108.6   461.4   585.0      0
+    wsgi     200   123.8  1883.5  2363.6      0
+    asgi      10    73.9   134.7   303.9      0
+    asgi      50    65.8   794.1   969.9      0
+    asgi     200    75.0  2644.0  3885.5      0
+
+Neither setup dropped connections. For cached pages, which are CPU bound,
+the thread hops of the async views cost about a third of the throughput.
+The ASGI workers pay off when requests wait instead, e.g. on send_mail or
+slow clients, which tie up a sync worker for the whole time.
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pita.settings")
+
+application = get_asgi_application()
@@ -0,0 +1,22 @@
+import itertools
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class FragmentCache(FileBasedCache):
+    """A file-based cache for many small entries that are written once.
+
+    The built-in backend lists the whole cache directory before every write
+    to check whether it needs culling, so filling the cache for a large
+    gallery takes quadratic time. This one only checks every CULL_EVERY
+    writes, and may go over MAX_ENTRIES by that much in between.
+    """
+    CULL_EVERY = 500
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._writes = itertools.count(1)
+
+    def _cull(self):
+        if next(self._writes) % self.CULL_EVERY == 0:
+            super()._cull()
@@ -0,0 +1,292 @@
+"""The sitemap and the Atom feeds for new artwork and comic pages.
+
+Entries are stored as Listing rows and updated one at a time from the
+model signals. Each rendered document is cached until one of its entries
+changes, and its change stamp is used for conditional GET.
+"""
+import datetime
+from io import StringIO
+
+from constance import config
+from django.core.cache import cache
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import feedgenerator, timezone
+from django.utils.html import format_html
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from pita.models import (
+    Artwork, Collection, Comic, ComicPage, Listing, Page, Redirect)
+
+SITEMAP = Listing.SITEMAP
+ARTWORKS = Listing.ARTWORKS
+COMICS = Listing.COMICS
+
+# The number of entries in each feed
+FEED_LENGTH = 50
+
+
+def as_datetime(value):
+    """Converts the date fields (Artwork.uploaded) to datetimes."""
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+
+    return timezone.make_aware(
+        datetime.datetime.combine(value, datetime.time.min))
+
+
+# Change stamps
+
+def get_stamp_key(feed):
+    return f"pita:feeds:{feed}:stamp"
+
+
+def touch(feed):
+    cache.set(get_stamp_key(feed), timezone.now(), None)
+
+
+def get_stamp(feed):
+    """Returns the time a feed's entries last changed."""
+    key = get_stamp_key(feed)
+    stamp = cache.get(key)
+
+    if stamp is None:
+        stamp = timezone.now()
+        cache.set(key, stamp, None)
+
+    return stamp
+
+
+def get_etag(request, feed):
+    return f"{request.get_host()}-{get_stamp(feed).timestamp()}"
+
+
+# Storing entries
+
+def store(feed, key, url, updated, **fields):
+    Listing.objects.update_or_create(
+        feed=feed, key=key,
+        defaults={'url': url, 'updated': as_datetime(updated), **fields})
+    touch(feed)
+
+
+def remove(feed, key):
+    Listing.objects.filter(feed=feed, key=key).delete()
+    touch(feed)
+
+
+def list_page(page):
+    if isinstance(page, Redirect):
+        return
+
+    updated = None
+    if isinstance(page, Collection):
+        updated = page.artworks_updated
+
+    store(SITEMAP, f'page:{page.pk}', page.get_absolute_url(), updated,
+          title=page.title)
+
+
+def list_artwork(artwork):
+    if artwork.collection_id is None:
+        url = reverse('index')
+    else:
+        url = artwork.collection.get_absolute_url()
+
+    store(ARTWORKS, f'artwork:{artwork.pk}', url, artwork.uploaded,
+          title=artwork.title or "Untitled", summary=artwork.description,
+          image=artwork.image.url)
+
+
+def list_collection(collection):
+    """Lists a collection, and its artworks if its URL changed: the artwork
+    listings link to their collection."""
+    previous = (
+        Listing.objects.filter(feed=SITEMAP, key=f'page:{collection.pk}')
+        .values_list('url', flat=True).first())
+
+    list_page(collection)
+
+    if previous != collection.get_absolute_url():
+        for artwork in collection.artworks.all():
+            list_artwork(artwork)
+
+
+def list_comic(comic):
+    updated = comic.pages.aggregate(Max('uploaded'))['uploaded__max']
+
+    store(SITEMAP, f'comic:{comic.pk}', comic.get_absolute_url(), updated,
+          title=comic.title)
+
+
+def list_comic_page(page):
+    key = f'comic_page:{page.pk}'
+    url = page.get_absolute_url()
+
+    store(SITEMAP, key, url, page.uploaded, title=str(page))
+    store(COMICS, key, url, page.uploaded,
+          title=str(page), image=page.image.url)
+
+
+def rebuild():
+    """Recreates every listing, returning the number of entries."""
+    Listing.objects.all().delete()
+
+    for page in Page.objects.select_subclasses():
+        list_page(page)
+    for artwork in Artwork.objects.select_related('collection'):
+        list_artwork(artwork)
+    for comic in Comic.objects.all():
+        list_comic(comic)
+    for page in ComicPage.objects.select_related('comic'):
+        list_comic_page(page)
+
+    return Listing.objects.count()
+
+
+# Rendering
+
+def render_sitemap(request):
+    urls = [reverse('index'), reverse('contact'), reverse('comic_index')]
+    entries = [(url, None) for url in urls]
+
+    listings = Listing.objects.filter(feed=SITEMAP).order_by('url')
+    entries += listings.values_list('url', 'updated')
+
+    out = StringIO()
+    xml = SimplerXMLGenerator(out, 'utf-8')
+    xml.startDocument()
+    xml.startElement(
+        'urlset', {'xmlns': 'http://www.sitemaps.org/schemas/sitemap/0.9'})
+
+    for url, updated in entries:
+        xml.startElement('url', {})
+        xml.addQuickElement('loc', request.build_absolute_uri(url))
+        if updated is not None:
+            xml.addQuickElement('lastmod', updated.isoformat())
+        xml.endElement('url')
+
+    xml.endElement('urlset')
+    xml.endDocument()
+
+    return out.getvalue()
+
+
+def render_feed(request, feed):
+    titles = dict(Listing.FEEDS)
+
+    atom = feedgenerator.Atom1Feed(
+        title=f"{config.TITLE}: {titles[feed].lower()}",
+        link=request.build_absolute_uri(reverse('index')),
+        description=config.DESCRIPTION,
+        feed_url=request.build_absolute_uri(),
+        author_name=config.NAME)
+
+    # Entry IDs can't depend on the entry's link, which changes whenever an
+    # artwork is moved to another collection
+    base = request.build_absolute_uri(reverse('index'))
+
+    for listing in Listing.objects.filter(feed=feed)[:FEED_LENGTH]:
+        link = request.build_absolute_uri(listing.url)
+        image = request.build_absolute_uri(listing.image)
+
+        atom.add_item(
+            title=listing.title,
+            link=link,
+            description=format_html(
+                '<p><img src="{}" alt="{}"></p><p>{}</p>',
+                image, listing.title, listing.summary),
+            unique_id=f"{base}#{listing.key}",
+            updateddate=listing.updated)
+
+    return atom.writeString('utf-8')
+
+
+def render(request, feed):
+    """Returns a rendered feed, cached until its entries change."""
+    key = f"pita:feeds:{feed}:{get_etag(request, feed)}"
+    content = cache.get(key)
+
+    if content is None:
+        if feed == SITEMAP:
+            content = render_sitemap(request)
+        else:
+            content = render_feed(request, feed)
+
+        cache.set(key, content, 60 * 60 * 24)
+
+    return content
+
+
+# Signal receivers
+
+@receiver(post_save, dispatch_uid='pita.feeds.update_listings')
+def update_listings(sender, instance, *args, **kwargs):
+    """Updates the listings of an object after it's saved."""
+    if isinstance(instance, Page):
+        # Pages edited through the base Page admin
+        if type(instance) is Page:
+            instance = Page.objects.get_subclass(pk=instance.pk)
+
+        if isinstance(instance, Collection):
+            list_collection(instance)
+        else:
+            list_page(instance)
+
+    elif sender is Artwork:
+        list_artwork(instance)
+        for collection in Collection.objects.filter(
+                pk__in=getattr(instance, '_updated_collections', ())):
+            list_page(collection)
+
+    elif sender is Comic:
+        list_comic(instance)
+
+        # The URLs of the pages depend on the comic's slug
+        for page in instance.pages.all():
+            list_comic_page(page)
+
+    elif sender is ComicPage:
+        list_comic_page(instance)
+
+        # A page moved to another comic changes the dates of both
+        previous = getattr(instance, '_previous_comic', None)
+        for comic in Comic.objects.filter(
+                pk__in={instance.comic_id, previous} - {None}):
+            list_comic(comic)
+
+
+@receiver(pre_delete, sender=Collection,
+          dispatch_uid='pita.feeds.track_artworks')
+def track_artworks(sender, instance, *args, **kwargs):
+    """Stores the artworks of a collection that's about to be deleted, as
+    they're moved out of it without sending any signals."""
+    instance._artworks = list(
+        instance.artworks.values_list('pk', flat=True))
+
+
+@receiver(post_delete, dispatch_uid='pita.feeds.remove_listings')
+def remove_listings(sender, instance, *args, **kwargs):
+    if isinstance(instance, Page):
+        remove(SITEMAP, f'page:{instance.pk}')
+
+        # Artworks of a deleted collection now link to the index
+        for artwork in Artwork.objects.filter(
+                pk__in=getattr(instance, '_artworks', ())):
+            list_artwork(artwork)
+
+    elif sender is Artwork:
+        remove(ARTWORKS, f'artwork:{instance.pk}')
+        for collection in Collection.objects.filter(
+                pk__in=getattr(instance, '_updated_collections', ())):
+            list_page(collection)
+
+    elif sender is Comic:
+        remove(SITEMAP, f'comic:{instance.pk}')
+
+    elif sender is ComicPage:
+        remove(SITEMAP, f'comic_page:{instance.pk}')
+        remove(COMICS, f'comic_page:{instance.pk}')
+        list_comic(instance.comic)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from pita.feeds import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the stored sitemap and feed entries."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} entries"))
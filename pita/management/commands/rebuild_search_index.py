@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from pita.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} objects"))
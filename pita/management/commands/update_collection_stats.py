@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pita.models import Collection, update_collection_stats
+
+
+class Command(BaseCommand):
+    help = "Recounts the artworks in every collection."
+
+    def handle(self, *args, **options):
+        pks = Collection.objects.values_list('pk', flat=True)
+        update_collection_stats(*pks)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {len(pks)} collections"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from pita.warm import warm
+
+
+class Command(BaseCommand):
+    help = ("Renders every public page to fill the shared caches. Compiled "
+            "templates are per process and aren't warmed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help="The number of pages to render at the same time")
+
+    def handle(self, *args, **options):
+        results = warm(workers=options['workers'])
+
+        for url, status, elapsed in results:
+            line = f"{status} {elapsed * 1000:8.1f} ms  {url}"
+
+            if status >= 400:
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        total = sum(elapsed for _, _, elapsed in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {len(results)} pages in {total:.2f} s"))
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import pita.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Comic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Page',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=20, unique=True)),
+                ('slug', models.SlugField(blank=True, max_length=20, unique=True)),
+                ('position', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['position', '-pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Collection',
+            fields=[
+                ('page_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='pita.page')),
+                ('description', models.TextField(blank=True)),
+            ],
+            bases=('pita.page',),
+        ),
+        migrations.CreateModel(
+            name='Redirect',
+            fields=[
+                ('page_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='pita.page')),
+                ('link', models.URLField(max_length=500)),
+            ],
+            bases=('pita.page',),
+        ),
+        migrations.CreateModel(
+            name='Text',
+            fields=[
+                ('page_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='pita.page')),
+                ('content', models.TextField(blank=True, help_text='Markdown formatting supported')),
+                ('html', models.TextField(blank=True, editable=False)),
+            ],
+            bases=('pita.page',),
+        ),
+        migrations.CreateModel(
+            name='ComicPage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('image', models.ImageField(upload_to=pita.models.get_comic_page_path)),
+                ('uploaded', models.DateTimeField(auto_now_add=True)),
+                ('comic', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='pages', to='pita.comic')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Artwork',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(height_field='height', upload_to=pita.models.get_artwork_path, width_field='width')),
+                ('thumbnail', models.ImageField(editable=False, upload_to=pita.models.get_thumbnail_path)),
+                ('width', models.PositiveIntegerField(default=0, editable=False)),
+                ('height', models.PositiveIntegerField(default=0, editable=False)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('uploaded', models.DateField(auto_now_add=True)),
+                ('created', models.DateField(blank=True, null=True)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('collection', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='artworks', to='pita.collection')),
+            ],
+            options={
+                'ordering': ['position', '-pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:22
+
+"""Sites set up before the migrations were committed have their own,
+untracked migrations for 0001_initial's schema. To upgrade one:
+
+    rm pita/migrations/0*.py     # before pulling
+    git pull
+    python manage.py migrate pita 0001 --fake
+    python manage.py migrate
+    python manage.py update_collection_stats
+    python manage.py rebuild_search_index
+    python manage.py rebuild_feeds
+"""
+from django.db import migrations, models
+import pita.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pita', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='artwork_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='artworks_updated',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='comicpage',
+            name='height',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comicpage',
+            name='width',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='comicpage',
+            name='image',
+            field=models.ImageField(height_field='height', upload_to=pita.models.get_comic_page_path, width_field='width'),
+        ),
+        migrations.CreateModel(
+            name='Listing',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(choices=[('sitemap', 'Sitemap'), ('artworks', 'New artwork'), ('comics', 'New comic pages')], max_length=20)),
+                ('key', models.CharField(max_length=50)),
+                ('url', models.CharField(max_length=500)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('summary', models.TextField(blank=True)),
+                ('image', models.CharField(blank=True, max_length=500)),
+                ('updated', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-updated', 'url'],
+                'unique_together': {('feed', 'key')},
+            },
+        ),
+    ]
@@ -1,10 +1,12 @@
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files import File
 from django.db import models
 from django.db.models import Q, QuerySet
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.text import slugify
 
@@ -17,6 +19,9 @@ from model_utils.managers import InheritanceManager
 from typing import Optional
 
 
+PAGES_CACHE_KEY = 'pita:pages'
+
+
 class Page(models.Model):
     objects = InheritanceManager()
 
@@ -24,7 +29,7 @@ class Page(models.Model):
     slug = models.SlugField(max_length=20, blank=True, unique=True)
     position = models.PositiveIntegerField(default=0)
 
-    reserved_titles = ['admin', 'contact']
+    reserved_titles = ['admin', 'contact', 'search']
 
     def clean(self):
         if self.title.lower() in self.reserved_titles:
@@ -45,9 +50,22 @@ class Page(models.Model):
         ordering = ['position', '-pk']
 
 
+@receiver(post_save, dispatch_uid='pita.models.invalidate_pages_save')
+@receiver(post_delete, dispatch_uid='pita.models.invalidate_pages_delete')
+def invalidate_pages(sender, instance, *args, **kwargs):
+    """Clears the cached navigation pages after any page is changed."""
+    if isinstance(instance, Page):
+        cache.delete(PAGES_CACHE_KEY)
+
+
 class Collection(Page):
     description = models.TextField(blank=True)
 
+    # Kept up to date by the artwork signal receivers
+    artwork_count = models.PositiveIntegerField(default=0, editable=False)
+    artworks_updated = models.DateTimeField(
+        blank=True, null=True, editable=False)
+
 
 class Text(Page):
     content = models.TextField(
@@ -98,6 +116,7 @@ class Artwork(models.Model):
 
     uploaded = models.DateField(auto_now_add=True)
     created = models.DateField(blank=True, null=True)
+    modified = models.DateTimeField(auto_now=True)
 
     position = models.PositiveIntegerField(default=0)
 
@@ -187,6 +206,50 @@ def rename_files(sender, instance, created, *args, **kwargs):
     artwork.save()
 
 
+def update_collection_stats(*pks):
+    """Recounts the artworks in the given collections."""
+    for pk in set(pks) - {None}:
+        Collection.objects.filter(pk=pk).update(
+            artwork_count=Artwork.objects.filter(collection=pk).count(),
+            artworks_updated=timezone.now())
+
+
+@receiver(pre_save, sender=Artwork,
+          dispatch_uid='pita.models.track_collection')
+def track_collection(sender, instance, *args, **kwargs):
+    """Stores the artwork's current collection, so that moving it to another
+    collection updates both."""
+    artwork = instance
+
+    # Nested save from a post-save receiver: keep the original collection
+    if hasattr(artwork, '_previous_collection'):
+        return
+
+    if artwork.pk is None:
+        artwork._previous_collection = None
+    else:
+        artwork._previous_collection = (
+            Artwork.objects.filter(pk=artwork.pk)
+            .values_list('collection_id', flat=True).first())
+
+
+@receiver(post_save, sender=Artwork,
+          dispatch_uid='pita.models.update_collection_save')
+@receiver(post_delete, sender=Artwork,
+          dispatch_uid='pita.models.update_collection_delete')
+def update_collection(sender, instance, *args, **kwargs):
+    """Updates the stats of the artwork's old and new collections."""
+    artwork = instance
+    previous = getattr(artwork, '_previous_collection', None)
+
+    if hasattr(artwork, '_previous_collection'):
+        del artwork._previous_collection
+
+    # Read by later receivers, see pita.feeds
+    artwork._updated_collections = {artwork.collection_id, previous} - {None}
+    update_collection_stats(*artwork._updated_collections)
+
+
 def create_thumbnail(artwork, size=(400, 400)):
     """Creates a square thumbnail for an artwork object."""
     artwork.image.open()
@@ -200,7 +263,8 @@ def create_thumbnail(artwork, size=(400, 400)):
     if image.size < size:
         w, h = image.size
         ratio = max(size[0] / w, size[1] / h)
-        image = image.resize((w * ratio, h * ratio), PIL.Image.BICUBIC)
+        image = image.resize(
+            (int(w * ratio), int(h * ratio)), PIL.Image.BICUBIC)
 
     w, h = image.size
 
@@ -220,7 +284,7 @@ def create_thumbnail(artwork, size=(400, 400)):
         x2 = w
         y2 = h
 
-    bounds = map(int, (x1, y1, x2, y2))
+    bounds = tuple(map(int, (x1, y1, x2, y2)))
 
     image = image.crop(bounds)
     image.thumbnail(size)
@@ -288,13 +352,46 @@ class Comic(models.Model):
     def get_absolute_url(self) -> str:
         return reverse('comic', kwargs={'slug': self.slug})
 
+    @staticmethod
+    def get_manifest_key(pk: int) -> str:
+        return f"pita:comic:{pk}:manifest"
+
+    def get_manifest(self) -> dict:
+        """Returns this comic's pages in order, for the reader to flip
+        through without loading each page separately."""
+        key = self.get_manifest_key(self.pk)
+        manifest = cache.get(key)
+
+        if manifest is None:
+            pages = self.pages.order_by('number')
+
+            manifest = {
+                'title': self.title,
+                'url': self.get_absolute_url(),
+                'pages': [{
+                    'number': page.number,
+                    'url': reverse('comic_page', kwargs={
+                        'slug': self.slug, 'number': page.number}),
+                    'image': page.image.url,
+                    'width': page.width,
+                    'height': page.height,
+                } for page in pages],
+            }
+            cache.set(key, manifest, None)
+
+        return manifest
+
 
 class ComicPage(models.Model):
     comic = models.ForeignKey(
         Comic, on_delete=models.PROTECT, related_name='pages')
     number = models.PositiveSmallIntegerField()
 
-    image = models.ImageField(upload_to=get_comic_page_path)
+    image = models.ImageField(
+        upload_to=get_comic_page_path,
+        width_field='width', height_field='height')
+    width = models.PositiveIntegerField(default=0, editable=False)
+    height = models.PositiveIntegerField(default=0, editable=False)
     uploaded = models.DateTimeField(auto_now_add=True)
 
     def __str__(self) -> str:
@@ -345,3 +442,67 @@ class ComicPage(models.Model):
         ]
 
         return [self.get_link(*link) for link in links]
+
+
+@receiver(pre_save, sender=ComicPage, dispatch_uid='pita.models.track_comic')
+def track_comic(sender, instance, *args, **kwargs):
+    """Stores the page's current comic, so that moving it to another comic
+    updates both."""
+    page = instance
+
+    if page.pk is None:
+        page._previous_comic = None
+    else:
+        page._previous_comic = (
+            ComicPage.objects.filter(pk=page.pk)
+            .values_list('comic_id', flat=True).first())
+
+
+@receiver(post_save, sender=Comic,
+          dispatch_uid='pita.models.invalidate_comic_manifest')
+@receiver(post_save, sender=ComicPage,
+          dispatch_uid='pita.models.invalidate_manifest_save')
+@receiver(post_delete, sender=ComicPage,
+          dispatch_uid='pita.models.invalidate_manifest_delete')
+def invalidate_manifest(sender, instance, *args, **kwargs):
+    """Clears the cached manifest of a comic after it or a page changes."""
+    if sender is Comic:
+        pks = {instance.pk}
+    else:
+        pks = {instance.comic_id, getattr(instance, '_previous_comic', None)}
+
+    cache.delete_many([Comic.get_manifest_key(pk) for pk in pks - {None}])
+
+
+class Listing(models.Model):
+    """A precomputed entry in the sitemap or one of the feeds.
+
+    Listings are kept up to date by the receivers in pita.feeds, so that
+    serving the sitemap and feeds never queries the content itself.
+    """
+    SITEMAP = 'sitemap'
+    ARTWORKS = 'artworks'
+    COMICS = 'comics'
+
+    FEEDS = (
+        (SITEMAP, 'Sitemap'),
+        (ARTWORKS, 'New artwork'),
+        (COMICS, 'New comic pages'),
+    )
+
+    feed = models.CharField(max_length=20, choices=FEEDS)
+    key = models.CharField(max_length=50)
+
+    url = models.CharField(max_length=500)
+    title = models.CharField(max_length=200, blank=True)
+    summary = models.TextField(blank=True)
+    image = models.CharField(max_length=500, blank=True)
+
+    updated = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self) -> str:
+        return f"{self.feed}: {self.url}"
+
+    class Meta:
+        ordering = ['-updated', 'url']
+        unique_together = ('feed', 'key')
@@ -0,0 +1,168 @@
+"""Full-text search over artworks, text pages and comics.
+
+The index is an SQLite FTS5 table. Each indexed object has a fixed rowid
+derived from its kind and primary key, so that updating or removing a
+single object never has to scan the index.
+"""
+from django.db import connection
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from pita.models import Artwork, Comic, Page, Text
+
+TABLE = 'pita_search'
+
+# Kind IDs are stored in the low bits of each rowid
+KINDS = {
+    Artwork: 1,
+    Text: 2,
+    Comic: 3,
+}
+KIND_BITS = 2
+
+# Control characters used to mark matches, replaced after HTML escaping
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+
+def get_rowid(obj):
+    return (obj.pk << KIND_BITS) | KINDS[type(obj)]
+
+
+def get_document(obj):
+    """Returns the (title, body) to index for an object."""
+    if isinstance(obj, Artwork):
+        return obj.title, obj.description
+    if isinstance(obj, Text):
+        return obj.title, obj.content
+    return obj.title, ''
+
+
+def create_table():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "title, body, tokenize = 'porter unicode61')")
+
+
+def index(obj):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABLE} (rowid, title, body) "
+            "VALUES (%s, %s, %s)",
+            [get_rowid(obj), *get_document(obj)])
+
+
+def unindex(obj):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE rowid = %s", [get_rowid(obj)])
+
+
+def rebuild():
+    """Recreates the index from scratch, returning the number of objects."""
+    create_table()
+
+    rows = list()
+    for model in KINDS:
+        for obj in model.objects.all():
+            rows.append((get_rowid(obj), *get_document(obj)))
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+            rows)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+    return len(rows)
+
+
+def get_match(query):
+    """Turns user input into an FTS5 query: every word must match, as a
+    prefix, and FTS5 operators in the input are treated as plain text."""
+    terms = query.split()
+    return ' '.join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+
+
+def format_match(text):
+    html = escape(text)
+    html = html.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+    return mark_safe(html)
+
+
+def search(query, limit=50):
+    """Returns the best matching objects for a query, as dicts with the
+    object and its highlighted title and snippet."""
+    match = get_match(query)
+    if not match:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, "
+            f"highlight({TABLE}, 0, %s, %s), "
+            f"snippet({TABLE}, 1, %s, %s, '…', 24) "
+            f"FROM {TABLE} WHERE {TABLE} MATCH %s "
+            f"ORDER BY bm25({TABLE}, 10.0, 1.0) LIMIT %s",
+            [MATCH_START, MATCH_END, MATCH_START, MATCH_END, match, limit])
+        rows = cursor.fetchall()
+
+    # Load the matching objects, one query per kind
+    mask = (1 << KIND_BITS) - 1
+    objects = dict()
+
+    for model, kind in KINDS.items():
+        pks = [rowid >> KIND_BITS for rowid, _, _ in rows
+               if rowid & mask == kind]
+        if not pks:
+            continue
+
+        qs = model.objects.all()
+        if model is Artwork:
+            qs = qs.select_related('collection')
+
+        for pk, obj in qs.in_bulk(pks).items():
+            objects[(pk << KIND_BITS) | kind] = obj
+
+    results = list()
+    for rowid, title, snippet in rows:
+        # The index can briefly lag behind a deletion
+        if rowid not in objects:
+            continue
+
+        results.append({
+            'object': objects[rowid],
+            'kind': objects[rowid]._meta.verbose_name,
+            'title': format_match(title),
+            'snippet': format_match(snippet),
+        })
+
+    return results
+
+
+@receiver(post_migrate, dispatch_uid='pita.search.create_index')
+def create_index(sender, *args, **kwargs):
+    if sender.name == 'pita':
+        create_table()
+
+
+@receiver(post_save, dispatch_uid='pita.search.update_index')
+def update_index(sender, instance, *args, **kwargs):
+    """Reindexes an object after it's saved."""
+    # Pages edited through the base Page admin
+    if type(instance) is Page:
+        instance = Page.objects.get_subclass(pk=instance.pk)
+
+    if type(instance) in KINDS:
+        index(instance)
+
+
+@receiver(post_delete, dispatch_uid='pita.search.remove_from_index')
+def remove_from_index(sender, instance, *args, **kwargs):
+    # Deleting a base Page also deletes its subclass row, which sends its own
+    # signal, so only the subclasses need handling here
+    if type(instance) in KINDS:
+        unindex(instance)
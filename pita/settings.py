@@ -1,5 +1,6 @@
 import collections
 import os
+import sys
 
 
 # General
@@ -41,7 +42,6 @@ INSTALLED_APPS = [
     'pita',
     'anymail',
     'constance',
-    'constance.backends.database',
 ]
 
 MIDDLEWARE = [
@@ -56,12 +56,24 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'pita.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# Always keep compiled templates in memory in production; in development
+# templates are reloaded on every request. The compiled templates belong to
+# each worker process, so `manage.py warm_cache` can't fill them
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'constance.context_processors.config',
                 'django.template.context_processors.debug',
@@ -74,6 +86,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'pita.wsgi.application'
+ASGI_APPLICATION = 'pita.asgi.application'
 
 
 # Database
@@ -85,7 +98,47 @@ DATABASES = {
     }
 }
 
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 CONSTANCE_BACKEND = 'constance.backends.database.DatabaseBackend'
+CONSTANCE_DATABASE_CACHE_BACKEND = 'default'
+
+
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+    # Rendered HTML fragments, keyed on the object's modification time, so
+    # they never need to be invalidated. They're stored on disk so that every
+    # worker, and `manage.py warm_cache`, shares them
+    'fragments': {
+        'BACKEND': 'pita.cache.FragmentCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'fragments'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
+# The tests get their own caches, instead of writing to the ones on disk.
+# Constance refuses to cache in local memory, so its cache is turned off
+if sys.argv[1:2] == ['test']:
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'pita-test-{alias}',
+        } for alias in CACHES}
+    CONSTANCE_DATABASE_CACHE_BACKEND = None
+
+# Re-render every public page in the background after an admin edit
+WARM_CACHE_AFTER_EDITS = False
+
+# The host the pages are rendered for when warming the caches
+WARM_CACHE_HOST = 'saltpita.com'
 
 
 # Password validation
@@ -115,7 +168,6 @@ AUTH_PASSWORD_VALIDATORS = [
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'US/Eastern'
 USE_I18N = True
-USE_L10N = True
 USE_TZ = True
 
 DATE_FORMAT = 'D, Y-m-d'
@@ -150,6 +202,8 @@ CONSTANCE_GENERAL = {
     'DESCRIPTION': ("", "The site description, used for metadata"),
     'COPYRIGHT_YEARS': ("2018-2018", ""),
     'TERMS_OF_SERVICE_URL': ("", ""),
+    'COMIC_READER': (
+        False, "Flip between comic pages without reloading the whole page"),
 }
 
 # Custom: contact information
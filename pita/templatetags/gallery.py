@@ -0,0 +1,49 @@
+import hashlib
+
+from django import template
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+# Part of every fragment's key, along with the template's source. Bump it
+# when the fragments change without gallery_item.html changing, e.g. when
+# a property used by the template does.
+# 2: every fragment sets the image size, which the gallery layout relies on
+FRAGMENTS_VERSION = 2
+
+
+def get_version(item_template):
+    source = item_template.template.source.encode()
+    return f"{FRAGMENTS_VERSION}-{hashlib.md5(source).hexdigest()[:12]}"
+
+
+def get_item_key(artwork, version):
+    return (f"pita:artwork:{version}:"
+            f"{artwork.pk}:{artwork.modified.timestamp()}")
+
+
+@register.simple_tag
+def gallery_items(items):
+    """Renders the items of a gallery, reusing the cached HTML of any
+    artwork that hasn't changed since it was last rendered."""
+    cache = caches['fragments']
+
+    item_template = get_template('gallery_item.html')
+    version = get_version(item_template)
+
+    keys = [(item, get_item_key(item, version)) for item in items]
+    fragments = cache.get_many([key for _, key in keys])
+
+    missing = dict()
+
+    for item, key in keys:
+        if key not in fragments:
+            html = item_template.render({'item': item})
+            fragments[key] = missing[key] = html
+
+    if missing:
+        cache.set_many(missing)
+
+    return mark_safe(''.join(fragments[key] for _, key in keys))
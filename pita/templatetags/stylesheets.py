@@ -0,0 +1,43 @@
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def read_critical_css(name):
+    """Returns the critical CSS extracted for a page by `invoke build`."""
+    path = finders.find(f'critical/{name}.css')
+    if path is None:
+        return None
+
+    with open(path) as f:
+        return f.read()
+
+
+if not settings.DEBUG:
+    read_critical_css = lru_cache()(read_critical_css)
+
+
+@register.simple_tag
+def stylesheets(name):
+    """Inlines the critical CSS for a page and loads the full stylesheet
+    without blocking the first paint. Falls back to a regular stylesheet
+    if no critical CSS has been built."""
+    url = static('site.css')
+    css = read_critical_css(name)
+
+    if css is None:
+        return format_html('<link rel="stylesheet" href="{}">', url)
+
+    return format_html(
+        '<style>{}</style>\n'
+        '  <link rel="preload" href="{}" as="style" '
+        'onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '  <noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(css), url, url)
@@ -0,0 +1,181 @@
+import io
+import os
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from pita import archives
+from pita.archives import ZIP64_LIMIT, ZipArchive, parse_range
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-99', (0, 99)),
+            ('bytes=100-', (100, 999)),
+            ('bytes=-100', (900, 999)),
+            ('bytes=990-5000', (990, 999)),
+            ('bytes=-5000', (0, 999)),
+            (' bytes=5-5 ', (5, 5)),
+        ]
+
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 1000), expected)
+
+    def test_ignored(self):
+        for header in ['', 'bytes=-', 'bytes=a-b', 'items=0-99',
+                       'bytes=0-1,5-6', 'bytes=-1-2']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header in ['bytes=1000-', 'bytes=1000-2000', 'bytes=5-4',
+                       'bytes=-0']:
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range(header, 1000)
+
+
+class ArchiveReader(io.RawIOBase):
+    """A seekable file over an archive that only reads what's asked for."""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        start = [0, self.position, self.archive.size][whence]
+        self.position = start + offset
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.archive.size) - 1
+        if end < self.position:
+            return 0
+
+        data = b''.join(self.archive.iter_range(self.position, end))
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class ZipArchiveTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        self.contents = {
+            'gallery/0001.png': os.urandom(1000),
+            'gallery/0002.jpg': b'',
+            'gallery/ünïcode.gif': os.urandom(300 * 1024),
+        }
+        self.files = [(name, self.write(name, data))
+                      for name, data in self.contents.items()]
+
+    def write(self, name, data=b''):
+        path = os.path.join(self.directory.name, name.replace('/', '-'))
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def read(self, archive):
+        data = b''.join(archive.iter_range(0, archive.size - 1))
+        self.assertEqual(len(data), archive.size)
+        return data
+
+    def check(self, data):
+        """Checks an archive against the files it was built from."""
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.namelist(), list(self.contents))
+
+            for name, content in self.contents.items():
+                self.assertEqual(z.read(name), content)
+
+    def test_archive(self):
+        archive = ZipArchive(self.files)
+
+        self.assertFalse(archive.zip64)
+        self.check(self.read(archive))
+
+    def test_ranges(self):
+        archive = ZipArchive(self.files)
+        data = self.read(archive)
+
+        # Offsets inside and on the boundaries of the headers and files
+        offsets = sorted({offset for offset, _, _ in archive.segments} |
+                         {0, 1, 29, 31, archive.size - 1})
+
+        for start in offsets:
+            for end in offsets:
+                if start > end:
+                    continue
+
+                with self.subTest(start=start, end=end):
+                    chunk = b''.join(archive.iter_range(start, end))
+                    self.assertEqual(chunk, data[start:end + 1])
+
+    def test_missing_file(self):
+        missing = os.path.join(self.directory.name, 'missing.png')
+
+        with self.assertLogs('pita.archives', 'WARNING'):
+            archive = ZipArchive(self.files + [('gallery/0003.png', missing)])
+
+        self.assertEqual(len(archive.files), len(self.files))
+        self.check(self.read(archive))
+
+    def test_etag(self):
+        etag = ZipArchive(self.files).etag
+        self.assertEqual(ZipArchive(self.files).etag, etag)
+
+        os.utime(self.files[0][1], ns=(0, 0))
+        self.assertNotEqual(ZipArchive(self.files).etag, etag)
+
+    @mock.patch.object(archives, 'ZIP64_COUNT_LIMIT', 3)
+    def test_zip64_count(self):
+        archive = ZipArchive(self.files)
+
+        self.assertTrue(archive.zip64)
+        self.check(self.read(archive))
+
+    def test_zip64_size(self):
+        big = os.path.join(self.directory.name, 'big.bin')
+        with open(big, 'wb') as f:
+            f.truncate(ZIP64_LIMIT + 10)
+
+        get_crc = archives.get_crc
+
+        def get_small_crc(path, size, mtime):
+            # Skip reading the 4 GB file, which is never extracted
+            return 0 if path == big else get_crc(path, size, mtime)
+
+        files = [('big.bin', big)] + self.files
+
+        with mock.patch.object(archives, 'get_crc', get_small_crc):
+            archive = ZipArchive(files)
+            self.assertTrue(archive.zip64)
+
+            with zipfile.ZipFile(ArchiveReader(archive)) as z:
+                infos = z.infolist()
+                self.assertEqual(
+                    [info.filename for info in infos],
+                    ['big.bin'] + list(self.contents))
+                self.assertEqual(infos[0].file_size, ZIP64_LIMIT + 10)
+
+                # Stored past the 4 GB offset limit
+                self.assertGreater(infos[1].header_offset, ZIP64_LIMIT)
+
+                for name, content in self.contents.items():
+                    self.assertEqual(z.read(name), content)
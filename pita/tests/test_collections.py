@@ -0,0 +1,127 @@
+import os
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from pita.models import Artwork, Collection, update_collection_stats
+from pita.tests.utils import MediaTestCase, create_image
+
+
+class CollectionStatsTests(MediaTestCase):
+    def setUp(self):
+        self.sketches = Collection.objects.create(title="Sketches")
+        self.paintings = Collection.objects.create(title="Paintings")
+
+    def create_artwork(self, collection):
+        return Artwork.objects.create(
+            image=create_image(), collection=collection)
+
+    def assertCounts(self, sketches, paintings):
+        self.sketches.refresh_from_db()
+        self.paintings.refresh_from_db()
+
+        self.assertEqual(self.sketches.artwork_count, sketches)
+        self.assertEqual(self.paintings.artwork_count, paintings)
+
+    def test_create(self):
+        artwork = self.create_artwork(self.sketches)
+
+        self.assertCounts(1, 0)
+        self.assertIsNotNone(self.sketches.artworks_updated)
+        self.assertEqual(artwork._updated_collections, {self.sketches.pk})
+
+        # The files were renamed in a nested save
+        self.assertEqual(artwork.filename, f'{artwork.pk:04d}.png')
+        self.assertTrue(os.path.exists(artwork.image.path))
+        self.assertFalse(hasattr(artwork, '_previous_collection'))
+
+    def test_create_without_collection(self):
+        self.create_artwork(None)
+        self.assertCounts(0, 0)
+
+    def test_move(self):
+        artwork = self.create_artwork(self.sketches)
+        updated = Collection.objects.get(pk=self.sketches.pk).artworks_updated
+
+        artwork.collection = self.paintings
+        artwork.save()
+
+        self.assertCounts(0, 1)
+        self.assertGreater(self.sketches.artworks_updated, updated)
+        self.assertEqual(
+            artwork._updated_collections,
+            {self.sketches.pk, self.paintings.pk})
+
+    def test_move_with_new_image(self):
+        # Replacing the image renames it in a nested save, which has to keep
+        # the collection the artwork was moved from
+        artwork = self.create_artwork(self.sketches)
+
+        artwork.collection = self.paintings
+        artwork.image = create_image('new.png', size=(60, 20))
+        artwork.save()
+
+        self.assertCounts(0, 1)
+        self.assertEqual(artwork.filename, f'{artwork.pk:04d}.png')
+        self.assertEqual(artwork.width, 60)
+
+    def test_remove_from_collection(self):
+        artwork = self.create_artwork(self.sketches)
+
+        artwork.collection = None
+        artwork.save()
+
+        self.assertCounts(0, 0)
+
+    def test_delete(self):
+        self.create_artwork(self.sketches)
+        artwork = self.create_artwork(self.sketches)
+
+        artwork.delete()
+
+        self.assertCounts(1, 0)
+
+    def test_update_collection_stats(self):
+        self.create_artwork(self.sketches)
+        Collection.objects.update(artwork_count=0)
+
+        update_collection_stats(self.sketches.pk, self.paintings.pk, None)
+
+        self.assertCounts(1, 0)
+
+
+class AdminQueryTests(MediaTestCase):
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com')
+        self.client.force_login(user)
+
+    def add_collections(self, count, artworks):
+        """Adds collections full of artworks, without creating any files."""
+        for i in range(count):
+            collection = Collection.objects.create(
+                title=f"Collection {Collection.objects.count()}")
+
+            Artwork.objects.bulk_create([
+                Artwork(image='image.png', thumbnail='thumb/image.jpg',
+                        width=1, height=1, title=f"Artwork {j}",
+                        collection=collection)
+                for j in range(artworks)])
+
+            update_collection_stats(collection.pk)
+
+    def assertConstantQueries(self, url, num):
+        self.add_collections(2, 3)
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.add_collections(20, 30)
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_collection_changelist(self):
+        self.assertConstantQueries(
+            reverse('admin:pita_collection_changelist'), 5)
+
+    def test_artwork_changelist(self):
+        self.assertConstantQueries(
+            reverse('admin:pita_artwork_changelist'), 5)
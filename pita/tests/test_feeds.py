@@ -0,0 +1,44 @@
+from pita.models import Artwork, Collection, Listing, Page
+from pita.tests.utils import MediaTestCase, create_image
+
+
+class ArtworkListingTests(MediaTestCase):
+    def setUp(self):
+        self.collection = Collection.objects.create(title="Sketches")
+        self.artwork = Artwork.objects.create(
+            image=create_image(), title="Cat", collection=self.collection)
+
+    def get_url(self):
+        return Listing.objects.get(
+            feed=Listing.ARTWORKS, key=f'artwork:{self.artwork.pk}').url
+
+    def test_rename_collection(self):
+        self.assertEqual(self.get_url(), '/sketches')
+
+        # The way PageAdmin saves pages
+        page = Page.objects.get(pk=self.collection.pk)
+        page.title = "Drawings"
+        page.save()
+
+        self.assertEqual(self.get_url(), '/drawings')
+
+        response = self.client.get('/feeds/artworks.xml')
+        self.assertContains(response, 'http://testserver/drawings')
+        self.assertNotContains(response, 'http://testserver/sketches')
+
+    def test_delete_collection(self):
+        self.collection.delete()
+
+        self.assertEqual(self.get_url(), '/')
+
+    def test_entry_id(self):
+        entry_id = f'<id>http://testserver/#artwork:{self.artwork.pk}</id>'
+
+        response = self.client.get('/feeds/artworks.xml')
+        self.assertContains(response, entry_id)
+
+        self.artwork.collection = None
+        self.artwork.save()
+
+        response = self.client.get('/feeds/artworks.xml')
+        self.assertContains(response, entry_id)
@@ -0,0 +1,31 @@
+from django.test import TestCase
+
+from pita import search
+from pita.models import Page, Text
+
+
+def titles(query):
+    return [result['object'].title for result in search.search(query)]
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.text = Text.objects.create(title="About", content="Painter")
+
+    def test_index_on_save(self):
+        self.assertEqual(titles('about'), ["About"])
+        self.assertEqual(titles('paint'), ["About"])
+
+    def test_save_base_page(self):
+        # The way PageAdmin and update_positions save pages
+        page = Page.objects.get(pk=self.text.pk)
+        page.title = "Biography"
+        page.save()
+
+        self.assertEqual(titles('biography'), ["Biography"])
+        self.assertEqual(titles('about'), [])
+
+    def test_delete_base_page(self):
+        Page.objects.get(pk=self.text.pk).delete()
+
+        self.assertEqual(titles('about'), [])
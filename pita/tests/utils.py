@@ -0,0 +1,30 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+import PIL.Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+
+def create_image(name='image.png', size=(40, 30)):
+    data = BytesIO()
+    PIL.Image.new('RGB', size).save(data, 'PNG')
+    return SimpleUploadedFile(name, data.getvalue())
+
+
+class MediaTestCase(TestCase):
+    """Stores uploaded files in a temporary MEDIA_ROOT."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
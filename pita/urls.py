@@ -1,13 +1,12 @@
 from django.conf import settings
-from django.conf.urls import url
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 
 from pita import views
 
 urlpatterns = [
-    url(r'^admin/', admin.site.urls),
+    re_path(r'^admin/', admin.site.urls),
 ]
 
 if settings.DEBUG:
@@ -18,6 +17,9 @@ if settings.DEBUG:
 
 comic_patterns = [
     path('<slug:slug>/<int:number>', views.view_comic, name='comic_page'),
+    path('<slug:slug>/manifest.json', views.comic_manifest,
+         name='comic_manifest'),
+    path('<slug:slug>.zip', views.download_comic, name='comic_download'),
     path('<slug:slug>', views.view_comic, name='comic'),
 
     path('', views.comic_index, name='comic_index'),
@@ -26,6 +28,14 @@ comic_patterns = [
 urlpatterns += [
     path('', views.index, name='index'),
     path('contact/', views.ContactView.as_view(), name='contact'),
+    path('search/', views.search, name='search'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path('download/<slug:slug>.zip', views.download_collection,
+         name='collection_download'),
+    path('feeds/artworks.xml', views.feed, {'name': 'artworks'},
+         name='artwork_feed'),
+    path('feeds/comics.xml', views.feed, {'name': 'comics'},
+         name='comic_feed'),
     path('comics/', include(comic_patterns)),
-    url(r'^(?P<slug>[a-z0-9]+(?:-[a-z0-9]+)*)$', views.page, name='page'),
+    re_path(r'^(?P<slug>[a-z0-9]+(?:-[a-z0-9]+)*)$', views.page, name='page'),
 ]
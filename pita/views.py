@@ -1,50 +1,77 @@
+import os
+
+from asgiref.sync import sync_to_async
 from django.contrib import messages
+from django.core.cache import cache
 from django.core.mail import send_mail
-from django.http import Http404
-from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import render, redirect
 from django.views import View
+from django.views.decorators.http import condition
 
 from anymail.exceptions import AnymailAPIError, AnymailInvalidAddress
 from constance import config
+from pita import archives, feeds, search as search_index
 from pita.models import (
-    Artwork, Collection, Comic, ComicPage, Page, Redirect, Text)
+    PAGES_CACHE_KEY, Artwork, Collection, Comic, ComicPage, Page, Redirect,
+    Text)
+
+
+async def aget_pages():
+    pages = await cache.aget(PAGES_CACHE_KEY)
+
+    if pages is None:
+        qs = Page.objects.select_subclasses().order_by('position')
+        pages = [p async for p in qs]
+        await cache.aset(PAGES_CACHE_KEY, pages)
 
+    return pages
 
-def get_pages():
-    return Page.objects.select_subclasses().order_by('position')
 
+async def arender(request, template_name, context=None):
+    """Renders a template outside of the event loop.
 
-def index(request):
-    pages = get_pages()
-    artworks = Artwork.objects.filter(collection=None)
+    Context processors (constance) and lazy lookups in the templates still
+    query the database synchronously.
+    """
+    return await sync_to_async(render)(request, template_name, context=context)
+
+
+async def index(request):
+    pages = await aget_pages()
+    artworks = [a async for a in Artwork.objects.filter(collection=None)]
 
     context = {
         'artworks': artworks,
         'pages': pages,
     }
-    return render(request, 'index.html', context=context)
+    return await arender(request, 'index.html', context=context)
 
 
 class ContactView(View):
     template_name = 'contact.html'
 
-    send_to = f"{config.EMAIL_NAME} <{config.EMAIL_ADDRESS}>"
-
     @staticmethod
+    @sync_to_async
     def get_message(status):
         return getattr(config, status).format(email=config.EMAIL_ADDRESS)
 
-    def get(self, request, *args, **kwargs):
-        pages = get_pages()
+    @staticmethod
+    @sync_to_async
+    def get_config(name):
+        return getattr(config, name)
+
+    async def get(self, request, *args, **kwargs):
+        pages = await aget_pages()
         context = {
-            'title': config.CONTACT_TITLE,
+            'title': await self.get_config('CONTACT_TITLE'),
             'pages': pages,
             'form': kwargs.pop('form', None),
         }
 
-        return render(request, self.template_name, context=context)
+        return await arender(request, self.template_name, context=context)
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         data = request.POST
 
         name = data.get('name', '')
@@ -63,32 +90,41 @@ class ContactView(View):
         # This shouldn't happen if the browser enforces the form requirements
         # correctly: the user might have sent a direct POST request
         if not (name and sent_by and subject and message):
-            messages.error(request, self.get_message('INVALID'))
-            return self.get(request, *args, **kwargs)
+            messages.error(request, await self.get_message('INVALID'))
+            return await self.get(request, *args, **kwargs)
 
         sent_by = '"{}" <{}>'.format(name, sent_by)
-        subject_line = '{} {}: {}'.format(config.SUBJECT_PREFIX, name, subject)
+        send_to = '{} <{}>'.format(
+            await self.get_config('EMAIL_NAME'),
+            await self.get_config('EMAIL_ADDRESS'))
+
+        prefix = await self.get_config('SUBJECT_PREFIX')
+        subject_line = '{} {}: {}'.format(prefix, name, subject)
+
+        # Sending blocks on the mail API, so it gets its own thread instead
+        # of the shared thread used for database access
+        send = sync_to_async(send_mail, thread_sensitive=False)
 
         try:
-            send_mail(subject_line, message, sent_by, [self.send_to])
+            await send(subject_line, message, sent_by, [send_to])
         except AnymailAPIError as e:
-            messages.error(request, self.get_message('API_ERROR'))
+            messages.error(request, await self.get_message('API_ERROR'))
         except AnymailInvalidAddress:
-            messages.error(request, self.get_message('INVALID_ADDRESS'))
+            messages.error(request, await self.get_message('INVALID_ADDRESS'))
         except:
-            messages.error(request, self.get_message('ERROR'))
+            messages.error(request, await self.get_message('ERROR'))
         else:
             form = None
-            messages.success(request, self.get_message('SUCCESS'))
+            messages.success(request, await self.get_message('SUCCESS'))
 
-        return self.get(request, *args, form=form, **kwargs)
+        return await self.get(request, *args, form=form, **kwargs)
 
 
-def page(request, slug):
-    pages = get_pages()
+async def page(request, slug):
+    pages = await aget_pages()
 
     try:
-        c = Collection.objects.get(slug=slug)
+        c = await Collection.objects.aget(slug=slug)
     except Collection.DoesNotExist:
         pass
     else:
@@ -98,10 +134,10 @@ def page(request, slug):
             'artworks': c.artworks,
             'pages': pages,
         }
-        return render(request, "collection.html", context=context)
+        return await arender(request, "collection.html", context=context)
 
     try:
-        t = Text.objects.get(slug=slug)
+        t = await Text.objects.aget(slug=slug)
     except Text.DoesNotExist:
         pass
     else:
@@ -110,30 +146,127 @@ def page(request, slug):
             'text': t,
             'pages': pages,
         }
-        return render(request, "text.html", context=context)
+        return await arender(request, "text.html", context=context)
 
     try:
-        r = Redirect.objects.get(slug=slug)
+        r = await Redirect.objects.aget(slug=slug)
     except Redirect.DoesNotExist:
         raise Http404
     else:
         return redirect(r.link, permanent=False)
 
 
-def comic_index(request):
-    comics = Comic.objects.all()
+async def comic_index(request):
+    comics = [c async for c in Comic.objects.all()]
+
+    return await arender(request, "comics.html", context={'comics': comics})
+
 
-    return render(request, "comics.html", context={'comics': comics})
+async def view_comic(request, slug, number=None):
+    comic_pages = ComicPage.objects.select_related('comic').filter(
+        comic__slug=slug)
 
+    try:
+        comic = await Comic.objects.aget(slug=slug)
 
-def view_comic(request, slug, number=None):
-    comic = get_object_or_404(Comic, slug=slug)
-    page = get_object_or_404(ComicPage, comic__slug=slug, number=number)
+        # The comic's own URL shows its first page
+        if number is None:
+            page = await comic_pages.order_by('number').afirst()
+        else:
+            page = await comic_pages.aget(number=number)
+    except (Comic.DoesNotExist, ComicPage.DoesNotExist):
+        raise Http404
+
+    if page is None:
+        raise Http404
+
+    # The next page's image is prefetched while the reader is on this page
+    manifest = await sync_to_async(comic.get_manifest)()
+    numbers = [p['number'] for p in manifest['pages']]
+
+    try:
+        next_page = manifest['pages'][numbers.index(page.number) + 1]
+    except (IndexError, ValueError):
+        next_page = None
 
     context = {
         'comic': comic,
         'page': page,
-        'pages': get_pages(),
+        'next_page': next_page,
+        'pages': await aget_pages(),
     }
 
-    return render(request, "comic.html", context=context)
+    return await arender(request, "comic.html", context=context)
+
+
+async def download_collection(request, slug):
+    try:
+        collection = await Collection.objects.aget(slug=slug)
+    except Collection.DoesNotExist:
+        raise Http404
+
+    files = [(f"{collection.slug}/{artwork.filename}", artwork.image.path)
+             async for artwork in collection.artworks.all()]
+    archive = await sync_to_async(archives.ZipArchive)(files)
+
+    return archives.get_response(request, archive, f"{collection.slug}.zip")
+
+
+async def download_comic(request, slug):
+    try:
+        comic = await Comic.objects.aget(slug=slug)
+    except Comic.DoesNotExist:
+        raise Http404
+
+    files = list()
+    async for page in comic.pages.order_by('number'):
+        _, ext = os.path.splitext(page.image.name)
+        files.append((f"{comic.slug}/{page.number:03d}{ext}", page.image.path))
+
+    archive = await sync_to_async(archives.ZipArchive)(files)
+
+    return archives.get_response(request, archive, f"{comic.slug}.zip")
+
+
+async def comic_manifest(request, slug):
+    try:
+        comic = await Comic.objects.aget(slug=slug)
+    except Comic.DoesNotExist:
+        raise Http404
+
+    manifest = await sync_to_async(comic.get_manifest)()
+    return JsonResponse(manifest)
+
+
+async def search(request):
+    query = request.GET.get('q', '').strip()
+    results = await sync_to_async(search_index.search)(query)
+
+    context = {
+        'title': 'Search',
+        'query': query,
+        'results': results,
+        'pages': await aget_pages(),
+    }
+
+    return await arender(request, "search.html", context=context)
+
+
+# The sitemap and feeds are sync views: the conditional GET decorators
+# don't support async views
+
+@condition(
+    etag_func=lambda request: feeds.get_etag(request, feeds.SITEMAP),
+    last_modified_func=lambda request: feeds.get_stamp(feeds.SITEMAP))
+def sitemap(request):
+    content = feeds.render(request, feeds.SITEMAP)
+    return HttpResponse(content, content_type='application/xml')
+
+
+@condition(
+    etag_func=lambda request, name: feeds.get_etag(request, name),
+    last_modified_func=lambda request, name: feeds.get_stamp(name))
+def feed(request, name):
+    content = feeds.render(request, name)
+    return HttpResponse(
+        content, content_type='application/atom+xml; charset=utf-8')
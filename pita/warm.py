@@ -0,0 +1,122 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from constance.signals import config_updated
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.test import Client
+from django.urls import reverse
+
+from pita.models import Comic, ComicPage, Page
+
+
+def get_urls():
+    """Returns every public URL in pita/urls.py, except for search results
+    and downloads."""
+    urls = [reverse('index'), reverse('contact'), reverse('comic_index'),
+            reverse('sitemap'), reverse('artwork_feed'), reverse('comic_feed')]
+
+    comics = list(Comic.objects.all())
+
+    urls += [p.get_absolute_url() for p in Page.objects.all()]
+    urls += [c.get_absolute_url() for c in comics]
+    urls += [reverse('comic_manifest', kwargs={'slug': c.slug})
+             for c in comics]
+    urls += [p.get_absolute_url()
+             for p in ComicPage.objects.select_related('comic')]
+
+    return urls
+
+
+def fetch(url):
+    """Renders a single URL, returning its status code and time taken."""
+    # The feeds are cached per host, so use the one visitors use
+    client = Client(
+        HTTP_HOST=settings.WARM_CACHE_HOST, raise_request_exception=False)
+
+    start = time.perf_counter()
+    try:
+        response = client.get(url)
+    finally:
+        # Each worker thread opens its own database connection
+        connections.close_all()
+
+    return url, response.status_code, time.perf_counter() - start
+
+
+def warm(urls=None, workers=4):
+    """Renders each URL through the test client to fill the shared caches.
+
+    Compiled templates are kept in memory by each worker process, so they
+    aren't warmed: every worker still compiles them on its first request.
+    """
+    if urls is None:
+        urls = get_urls()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fetch, urls))
+
+
+# Post-commit hook
+
+_lock = threading.Lock()
+_thread = None
+_pending = False
+
+
+def run_warming():
+    """Warms the caches until no edit was committed during the last pass."""
+    global _thread, _pending
+
+    try:
+        while True:
+            warm()
+
+            with _lock:
+                if not _pending:
+                    _thread = None
+                    return
+
+                _pending = False
+    except BaseException:
+        with _lock:
+            _thread = None
+        raise
+    finally:
+        # The URLs are listed on this thread's own database connection
+        connections.close_all()
+
+
+def start_warming():
+    """Warms the caches in a background thread. If it's already running,
+    another pass is run afterwards, as pages rendered before the edit are
+    out of date."""
+    global _thread, _pending
+
+    with _lock:
+        if _thread is not None:
+            _pending = True
+            return
+
+        _pending = False
+        _thread = threading.Thread(target=run_warming, daemon=True)
+        _thread.start()
+
+
+@receiver(post_save, dispatch_uid='pita.warm.warm_after_save')
+@receiver(post_delete, dispatch_uid='pita.warm.warm_after_delete')
+@receiver(config_updated, dispatch_uid='pita.warm.warm_after_config')
+def warm_after_edit(sender, *args, **kwargs):
+    """Re-renders the public pages once an admin edit has been committed."""
+    if not settings.WARM_CACHE_AFTER_EDITS:
+        return
+
+    # Skip saves of sessions, users, etc.
+    meta = getattr(sender, '_meta', None)
+    if meta is not None and meta.app_label != 'pita':
+        return
+
+    transaction.on_commit(start_warming)
@@ -1,7 +1,286 @@
+import os
+import re
+import shlex
+import statistics
+import subprocess
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
 from invoke import task
 
 
 manage = "pipenv run python manage.py"
+gunicorn = "pipenv run gunicorn"
+
+static = 'static'
+vendor = os.path.join(static, 'vendor')
+critical = os.path.join(static, 'critical')
+
+# Third-party assets, downloaded once into static/vendor
+VENDOR_FILES = {
+    'normalize.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/normalize/4.1.1/'
+        'normalize.min.css',
+    'masonry.pkgd.min.js':
+        'https://unpkg.com/masonry-layout@4.2.2/dist/masonry.pkgd.min.js',
+    'Luminous.min.js':
+        'https://cdnjs.cloudflare.com/ajax/libs/luminous-lightbox/1.0.1/'
+        'Luminous.min.js',
+    'luminous-basic.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/luminous-lightbox/1.0.1/'
+        'luminous-basic.min.css',
+}
+
+FONTS_CSS = ('https://fonts.googleapis.com/css2'
+             '?family=Montserrat:wght@300;700&display=swap')
+
+# Google Fonts only serves WOFF2 to browsers it recognizes
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+# Only the comic navigation icons are used, see ComicPage.get_links
+FA_FONT = ('https://use.fontawesome.com/releases/v5.10.1/webfonts/'
+           'fa-solid-900.woff2')
+FA_ICONS = {
+    'angle-double-left': 0xf100,
+    'angle-double-right': 0xf101,
+    'angle-left': 0xf104,
+    'angle-right': 0xf105,
+}
+
+# The stylesheets bundled into site.css, in order
+BUNDLE = [
+    os.path.join(vendor, 'normalize.min.css'),
+    os.path.join(vendor, 'montserrat.css'),
+    os.path.join(vendor, 'fa-nav.css'),
+    os.path.join(static, 'pita.css'),
+]
+
+# The templates (besides base.html) that make up each page, and any classes
+# that are only added outside of the templates
+PAGES = {
+    'base': ([], []),
+    'index': (['index.html', 'gallery.html', 'gallery_item.html'], []),
+    'collection': (
+        ['collection.html', 'gallery.html', 'gallery_item.html'], []),
+    'comics': (['comics.html', 'gallery.html', 'gallery_item.html'], []),
+    'comic': (
+        ['comic.html'],
+        ['fas', 'fa-fw'] + [f'fa-{name}' for name in FA_ICONS]),
+    'text': (['text.html'], []),
+    'contact': (['contact.html'], []),
+    'search': (['search.html'], []),
+}
+
+
+def download(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def write(path, data):
+    mode = 'w' if isinstance(data, str) else 'wb'
+    with open(path, mode) as f:
+        f.write(data)
+
+
+def vendor_fonts():
+    """Downloads the Latin subset of Montserrat and rewrites its CSS to
+    point to the local files."""
+    headers = {'User-Agent': USER_AGENT}
+    css = download(FONTS_CSS, headers=headers).decode()
+
+    out = list()
+    files = dict()
+    blocks = re.findall(r'/\* ([\w-]+) \*/\s*(@font-face \{.*?\})', css, re.S)
+
+    for subset, block in blocks:
+        if subset != 'latin':
+            continue
+
+        url = re.search(r'url\((.*?)\)', block).group(1)
+
+        # Variable fonts use the same file for every weight
+        if url not in files:
+            weight = re.search(r'font-weight: (\d+)', block).group(1)
+            files[url] = f'montserrat-{weight}.woff2'
+            write(os.path.join(vendor, files[url]),
+                  download(url, headers=headers))
+
+        out.append(block.replace(url, files[url]))
+
+    write(os.path.join(vendor, 'montserrat.css'), '\n'.join(out))
+
+
+def vendor_icons():
+    """Subsets the Font Awesome solid font to the icons in FA_ICONS."""
+    from fontTools import subset
+
+    path = os.path.join(vendor, 'fa-solid-900.woff2')
+    write(path, download(FA_FONT))
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+
+    font = subset.load_font(path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=FA_ICONS.values())
+    subsetter.subset(font)
+    subset.save_font(font, path, options)
+
+    css = [
+        '@font-face{font-family:"Font Awesome 5 Free";font-style:normal;'
+        'font-weight:900;font-display:block;'
+        'src:url(fa-solid-900.woff2) format("woff2")}',
+        '.fas{display:inline-block;font-family:"Font Awesome 5 Free";'
+        'font-weight:900;font-style:normal;font-variant:normal;'
+        'line-height:1;text-rendering:auto;'
+        '-webkit-font-smoothing:antialiased}',
+        '.fa-fw{text-align:center;width:1.25em}',
+    ]
+    for name, codepoint in FA_ICONS.items():
+        css.append(f'.fa-{name}:before{{content:"\\{codepoint:x}"}}')
+
+    write(os.path.join(vendor, 'fa-nav.css'), '\n'.join(css))
+
+
+def bundle():
+    """Concatenates the stylesheets into site.css, fixing relative URLs."""
+    out = list()
+
+    for path in BUNDLE:
+        with open(path) as f:
+            css = f.read()
+
+        prefix = os.path.relpath(os.path.dirname(path), static)
+        if prefix != '.':
+            css = re.sub(
+                r'url\((?![\'"]?(?:data:|https?:|/))([\'"]?)',
+                fr'url(\1{prefix}/', css)
+
+        out.append(css)
+
+    write(os.path.join(static, 'site.css'), '\n'.join(out))
+
+
+# Critical CSS
+
+def strip_comments(css):
+    return re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+
+
+def split_rules(css):
+    """Splits a stylesheet into its top-level (prelude, body) pairs."""
+    rules = list()
+    depth = start = prelude_end = 0
+
+    for i, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                prelude = css[start:prelude_end].strip()
+                rules.append((prelude, css[prelude_end + 1:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            # Statements like @charset
+            start = i + 1
+
+    return rules
+
+
+def get_used(paths, extra_classes):
+    """Returns the tags, classes and IDs used in a set of templates."""
+    tags = {'html', 'body'}
+    classes = set(extra_classes)
+    ids = set()
+
+    for path in paths:
+        with open(path) as f:
+            html = f.read()
+
+        tags.update(t.lower() for t in re.findall(r'<([a-zA-Z][\w-]*)', html))
+        for value in re.findall(r'class="([^"]*)"', html):
+            classes.update(value.split())
+        ids.update(re.findall(r'id="([^"]*)"', html))
+
+    return tags, classes, ids
+
+
+def is_used(selector, used):
+    tags, classes, ids = used
+
+    # Pseudo-classes, pseudo-elements and attributes can't be checked
+    selector = re.sub(r'::?[\w-]+(\([^)]*\))?', '', selector)
+    selector = re.sub(r'\[[^\]]*\]', '', selector)
+
+    return (
+        all(c in classes for c in re.findall(r'\.([\w-]+)', selector)) and
+        all(i in ids for i in re.findall(r'#([\w-]+)', selector)) and
+        all(t.lower() in tags for t in
+            re.findall(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)', selector)))
+
+
+def extract(css, used):
+    """Returns the rules of a stylesheet that apply to the used elements."""
+    out = list()
+
+    for prelude, body in split_rules(css):
+        if prelude.startswith(('@media', '@supports')):
+            inner = extract(body, used)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            # @font-face and @keyframes come with the full stylesheet
+            continue
+        else:
+            selectors = [s.strip() for s in prelude.split(',')]
+            selectors = [s for s in selectors if is_used(s, used)]
+            if selectors:
+                body = ' '.join(body.split())
+                out.append(f'{",".join(selectors)}{{{body}}}')
+
+    return ''.join(out)
+
+
+def extract_critical():
+    with open(os.path.join(static, 'site.css')) as f:
+        css = strip_comments(f.read())
+
+    os.makedirs(critical, exist_ok=True)
+
+    for name, (templates, extra_classes) in PAGES.items():
+        paths = [os.path.join('templates', t)
+                 for t in ['base.html'] + templates]
+        used = get_used(paths, extra_classes)
+
+        out = extract(css, used)
+        write(os.path.join(critical, f'{name}.css'), out)
+        print(f"  {name}: {len(out)} bytes")
+
+
+@task
+def vendor_assets(ctx, force=False):
+    os.makedirs(vendor, exist_ok=True)
+
+    for name, url in VENDOR_FILES.items():
+        path = os.path.join(vendor, name)
+        if force or not os.path.exists(path):
+            print(f"Downloading {name}")
+            write(path, download(url))
+
+    if force or not os.path.exists(os.path.join(vendor, 'montserrat.css')):
+        print("Downloading fonts")
+        vendor_fonts()
+
+    if force or not os.path.exists(os.path.join(vendor, 'fa-nav.css')):
+        print("Subsetting icons")
+        vendor_icons()
 
 
 @task
@@ -10,7 +289,109 @@ def build(ctx):
     with ctx.cd('static'):
         ctx.run("sass --update .:.")
 
+    vendor_assets(ctx)
+
+    print("Bundling stylesheets")
+    bundle()
+
+    print("Extracting critical CSS")
+    extract_critical()
+
     print("Collecting static files")
     ctx.run(f"{manage} collectstatic --no-input")
 
     print("Done!")
+
+
+# Load testing
+
+# The same gunicorn setup, serving the WSGI and ASGI entry points
+SERVERS = {
+    'wsgi': ['pita.wsgi:application', '-k', 'sync'],
+    'asgi': ['pita.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def start_server(name, workers, port):
+    app, *args = SERVERS[name]
+    command = shlex.split(gunicorn) + [
+        app, *args, '-w', str(workers), '-b', f'127.0.0.1:{port}',
+        '--backlog', '2048', '--log-level', 'warning']
+
+    server = subprocess.Popen(command)
+    url = f'http://127.0.0.1:{port}/'
+
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError(f"{name} server didn't start")
+
+
+def load(url, connections, duration):
+    """Keeps a number of connections busy with requests for a while,
+    returning the latency of each response and the number of errors."""
+    deadline = time.monotonic() + duration
+
+    def client():
+        latencies, errors = list(), 0
+
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+            except OSError:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+        return latencies, errors
+
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        results = [pool.submit(client) for _ in range(connections)]
+        results = [r.result() for r in results]
+
+    latencies = sorted(t for ts, _ in results for t in ts)
+    errors = sum(e for _, e in results)
+
+    return latencies, errors
+
+
+@task
+def loadtest(ctx, workers=2, connections='10,50,200', duration=10, path='/',
+             port=8100):
+    """Compares the WSGI (sync workers) and ASGI (uvicorn workers) setups at
+    increasing numbers of concurrent connections."""
+    url = f'http://127.0.0.1:{port}{path}'
+    counts = [int(c) for c in connections.split(',')]
+
+    print(f"{workers} workers, {duration} s per run, GET {path}")
+    print(f"{'server':6} {'conns':>5} {'req/s':>8} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>6}")
+
+    for name in SERVERS:
+        server = start_server(name, workers, port)
+
+        try:
+            # Fill the caches before measuring
+            load(url, 4, 2)
+
+            for count in counts:
+                latencies, errors = load(url, count, duration)
+
+                if latencies:
+                    p50 = statistics.median(latencies) * 1000
+                    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+                else:
+                    p50 = p99 = float('nan')
+
+                print(f"{name:6} {count:5} {len(latencies) / duration:8.1f} "
+                      f"{p50:8.1f} {p99:8.1f} {errors:6}")
+        finally:
+            server.terminate()
+            server.wait()